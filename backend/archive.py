@@ -0,0 +1,75 @@
+"""Batched archival of completed tasks into archived_tasks.
+
+Usage: python archive.py [--older-than-days N] [--batch-size N]
+Run periodically (cron or a scheduler); it is safe to run on several hosts at once.
+Orgs that sharding.move_org is moving are skipped until the move finishes.
+"""
+import argparse
+from datetime import datetime, timedelta
+from sqlalchemy import DateTime, literal, select
+import cache, models
+from config import get_settings
+from database import get_engine, get_shard_map
+
+tasks_table = models.Task.__table__
+archive_table = models.ArchivedTask.__table__
+TASK_COLUMNS = [column.name for column in tasks_table.columns]
+
+def _moving_orgs():
+    # Unsharded deployments never move orgs, and need no primary lookup
+    if not get_settings().database_shards:
+        return []
+    assignments = models.ShardAssignment
+    with get_engine().connect() as conn:
+        return list(conn.execute(select(assignments.organization_id).where(assignments.moving.is_(True))).scalars())
+
+def archive_batch(engine, cutoff: datetime, batch_size: int, skip_orgs: list = ()):
+    """Move one batch of old completed tasks; returns the affected org ids."""
+    now = datetime.utcnow()
+    query = (
+        select(tasks_table.c.id, tasks_table.c.organization_id)
+        .where(tasks_table.c.status == "completed", tasks_table.c.updated_at < cutoff)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    if skip_orgs:
+        query = query.where(tasks_table.c.organization_id.not_in(skip_orgs))
+    with engine.begin() as conn:
+        rows = conn.execute(query).all()
+        if not rows:
+            return set()
+        ids = [row.id for row in rows]
+        conn.execute(archive_table.insert().from_select(
+            TASK_COLUMNS + ["archived_at"],
+            select(*tasks_table.columns, literal(now, DateTime)).where(tasks_table.c.id.in_(ids)),
+        ))
+        conn.execute(tasks_table.delete().where(tasks_table.c.id.in_(ids)))
+    return {row.organization_id for row in rows}
+
+def archive_completed_tasks(engine, older_than_days: int = None, batch_size: int = None) -> int:
+    settings = get_settings()
+    older_than_days = settings.archive_after_days if older_than_days is None else older_than_days
+    batch_size = batch_size or settings.archive_batch_size
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+
+    orgs = set()
+    while True:
+        # Re-read every batch so a move that starts mid-run is honoured
+        batch_orgs = archive_batch(engine, cutoff, batch_size, _moving_orgs())
+        if not batch_orgs:
+            break
+        orgs |= batch_orgs
+    # Cached pages and counts for these orgs still list the archived rows
+    for org_id in orgs:
+        cache.invalidate_org_cache(str(org_id))
+    return len(orgs)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive completed tasks")
+    parser.add_argument("--older-than-days", type=int)
+    parser.add_argument("--batch-size", type=int)
+    args = parser.parse_args()
+
+    for name, engine in get_shard_map().engines.items():
+        orgs = archive_completed_tasks(engine, args.older_than_days, args.batch_size)
+        print(f"{name}: archived completed tasks for {orgs} organizations")
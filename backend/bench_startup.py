@@ -0,0 +1,39 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Measures cold-start cost in fresh interpreters: importing the app, running its
+# lifespan (settings, DDL, pool warm-up) and serving the first request. Each run
+# gets a fresh SQLite file so the DDL is never skipped.
+RUNS = int(os.getenv("BENCH_RUNS", 5))
+METRICS = ("import_ms", "lifespan_ms", "first_request_ms")
+
+PROBE = """
+import json, time
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(main.app) as client:
+    t2 = time.perf_counter()
+    assert client.get("/ready").status_code == 200
+    t3 = time.perf_counter()
+print(json.dumps({"import_ms": (t1 - t0) * 1000, "lifespan_ms": (t2 - t1) * 1000, "first_request_ms": (t3 - t2) * 1000}))
+"""
+
+def run_probe(db_dir: str, index: int) -> dict:
+    # Empty REDIS_URL overrides any .env value; the cache is optional and stays off
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_dir}/bench_{index}.db", REDIS_URL="")
+    out = subprocess.run([sys.executable, "-c", PROBE], env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as db_dir:
+        results = [run_probe(db_dir, i) for i in range(RUNS)]
+
+    for metric in METRICS:
+        values = [r[metric] for r in results]
+        print(f"{metric}: median={statistics.median(values):.1f} min={min(values):.1f} max={max(values):.1f}")
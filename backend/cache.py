@@ -1,18 +1,51 @@
 import redis
 import os
 import json
-from dotenv import load_dotenv
+import time
+from config import get_settings
 
-load_dotenv()
+_UNSET = object()
+_client = _UNSET
 
-REDIS_URL = os.getenv("REDIS_URL")
-try:
-    redis_client = redis.from_url(REDIS_URL, decode_responses=True)
-except Exception as e:
-    print(f"Redis connection error: {e}")
-    redis_client = None
+def get_client():
+    # Created on first use so importing this module does no I/O
+    global _client
+    if _client is _UNSET:
+        try:
+            _client = redis.from_url(get_settings().redis_url, decode_responses=True)
+        except Exception as e:
+            print(f"Redis connection error: {e}")
+            _client = None
+    return _client
+
+def reset_client():
+    # Each worker process needs its own pool; sockets inherited across fork are unsafe
+    global _client
+    _client = _UNSET
+
+os.register_at_fork(after_in_child=reset_client)
+
+def close_client():
+    global _client
+    if _client not in (_UNSET, None):
+        try:
+            _client.close()
+        except Exception as e:
+            print(f"Redis close error: {e}")
+    _client = _UNSET
+
+def ping() -> bool:
+    redis_client = get_client()
+    if not redis_client:
+        return False
+    try:
+        return bool(redis_client.ping())
+    except Exception as e:
+        print(f"Redis ping error: {e}")
+        return False
 
 def get_cache(key: str):
+    redis_client = get_client()
     if not redis_client:
         return None
     try:
@@ -23,6 +56,7 @@ def get_cache(key: str):
         return None
 
 def set_cache(key: str, value: any, ttl: int = 60):
+    redis_client = get_client()
     if not redis_client:
         return
     try:
@@ -31,6 +65,7 @@ def set_cache(key: str, value: any, ttl: int = 60):
         print(f"Redis set error: {e}")
 
 def delete_cache(key: str):
+    redis_client = get_client()
     if not redis_client:
         return
     try:
@@ -38,9 +73,43 @@ def delete_cache(key: str):
     except Exception as e:
         print(f"Redis delete error: {e}")
 
+def get_org_generation(org_id: str):
+    """Current data version for an org, or None when Redis is unavailable.
+
+    A missing counter is seeded from the clock so a flushed Redis never hands
+    out a generation (and hence an ETag) that was already used.
+    """
+    redis_client = get_client()
+    if not redis_client:
+        return None
+    try:
+        key = f"gen:{org_id}"
+        gen = redis_client.get(key)
+        if gen is None:
+            redis_client.set(key, time.time_ns(), nx=True)
+            gen = redis_client.get(key)
+        return int(gen)
+    except Exception as e:
+        print(f"Redis generation error: {e}")
+        return None
+
+def bump_org_generation(org_id: str):
+    redis_client = get_client()
+    if not redis_client:
+        return
+    try:
+        key = f"gen:{org_id}"
+        redis_client.set(key, time.time_ns(), nx=True)
+        redis_client.incr(key)
+    except Exception as e:
+        print(f"Redis generation error: {e}")
+
 def invalidate_org_cache(org_id: str):
+    redis_client = get_client()
     if not redis_client:
         return
+    # Counts are keyed by generation, so bumping it retires them without a KEYS scan
+    bump_org_generation(org_id)
     try:
         # Example: pattern-based invalidation (be careful with KEYS in production)
         keys = redis_client.keys(f"tasks:{org_id}:*")
@@ -48,3 +117,11 @@ def invalidate_org_cache(org_id: str):
             redis_client.delete(*keys)
     except Exception as e:
         print(f"Redis invalidate error: {e}")
+
+def user_summary_key(org_id: str) -> str:
+    return f"users:{org_id}"
+
+def invalidate_user_cache(org_id: str):
+    delete_cache(user_summary_key(org_id))
+    # Task pages fetched with expand=assignee embed user details
+    invalidate_org_cache(org_id)
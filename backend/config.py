@@ -0,0 +1,34 @@
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+class Settings(BaseSettings):
+    # Anchored to this file so the backend's .env is found from any working directory
+    model_config = SettingsConfigDict(env_file=Path(__file__).with_name(".env"), extra="ignore")
+
+    database_url: Optional[str] = None
+    db_pool_size: int = 5
+    # Extra task shards as JSON, e.g. {"shard1": "postgresql://..."}; primary is always a shard
+    database_shards: Dict[str, str] = {}
+    redis_url: Optional[str] = None
+
+    secret_key: Optional[str] = None
+    algorithm: str = "HS256"
+    access_token_expire_minutes: int = 15
+    refresh_token_expire_days: int = 7
+
+    # archive.py moves completed tasks untouched for this long into archived_tasks
+    archive_after_days: int = 30
+    archive_batch_size: int = 1000
+
+    threadpool_size: int = 40
+    web_concurrency: Optional[int] = None
+    host: str = "0.0.0.0"
+    port: int = 8000
+    graceful_timeout: int = 30
+
+@lru_cache
+def get_settings() -> Settings:
+    # Loaded on first use so importing the app never touches .env or the environment
+    return Settings()
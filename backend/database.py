@@ -1,31 +1,130 @@
-from sqlalchemy import create_engine
-# from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.schema import CreateIndex, CreateTable
+import bisect
+import hashlib
 import os
-from dotenv import load_dotenv
+from config import get_settings
 
-load_dotenv()
+PRIMARY_SHARD = "primary"
+# Tenant-scoped tables that live on the org's shard; everything else stays on primary
+SHARDED_TABLES = {"tasks", "archived_tasks"}
 
-DATABASE_URL = os.getenv("DATABASE_URL")
-if DATABASE_URL and DATABASE_URL.startswith("postgres://"):
-    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+_engine = None
+_shard_map = None
 
-# engine = create_engine(DATABASE_URL)
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,
-    connect_args={
-        "sslmode": "require",
-        "options": "-c search_path=public"
-    }
-)
+def _normalize_url(url):
+    if url and url.startswith("postgres://"):
+        url = url.replace("postgres://", "postgresql://", 1)
+    return url
 
+def _create_engine(url):
+    url = _normalize_url(url)
+    kwargs = {"pool_pre_ping": True}
+    if url and url.startswith("postgresql"):
+        kwargs["pool_size"] = get_settings().db_pool_size
+        kwargs["connect_args"] = {
+            "sslmode": "require",
+            "options": "-c search_path=public"
+        }
+    return create_engine(url, **kwargs)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def get_engine():
+    # Built on first use; create_engine itself does no I/O, and nothing runs at import
+    global _engine
+    if _engine is None:
+        _engine = _create_engine(get_settings().database_url)
+        SessionLocal.configure(bind=_engine)
+    return _engine
+
+def _hash(key: str) -> int:
+    return int(hashlib.md5(key.encode()).hexdigest(), 16)
+
+class ShardMap:
+    """Places new organizations on a consistent-hash ring of shards.
+
+    Placement only happens once: the result is pinned in shard_assignments
+    (see sharding.place_org), so changing the shard list never relocates an
+    org. Big tenants are pinned elsewhere with ``sharding.py move``.
+    """
+
+    def __init__(self, engines: dict, vnodes: int = 64):
+        self.engines = engines
+        self._ring = sorted((_hash(f"{name}:{i}"), name) for name in engines for i in range(vnodes))
+        self._points = [point for point, _ in self._ring]
+
+    def shard_for(self, org_id) -> str:
+        idx = bisect.bisect(self._points, _hash(str(org_id))) % len(self._points)
+        return self._ring[idx][1]
+
+def get_shard_map() -> ShardMap:
+    global _shard_map
+    if _shard_map is None:
+        settings = get_settings()
+        engines = {PRIMARY_SHARD: get_engine()}
+        for name, url in settings.database_shards.items():
+            engines[name] = _create_engine(url)
+        _shard_map = ShardMap(engines)
+    return _shard_map
+
+class ShardedSession(Session):
+    """Routes sharded tables to the shard in ``info["shard"]``.
+
+    The shard is set once the tenant is known (see dependencies.get_current_user);
+    until then, and for global tables, the primary bind is used.
+    """
+
+    def get_bind(self, mapper=None, **kw):
+        shard = self.info.get("shard")
+        if shard and mapper is not None and inspect(mapper).local_table.name in SHARDED_TABLES:
+            return get_shard_map().engines[shard]
+        return super().get_bind(mapper, **kw)
+
+SessionLocal = sessionmaker(class_=ShardedSession, autocommit=False, autoflush=False)
 Base = declarative_base()
 
+def _reset_pool_after_fork():
+    # Connections inherited from the parent must not be shared; drop them without closing
+    for engine in (_shard_map.engines.values() if _shard_map else [_engine]):
+        if engine is not None:
+            engine.dispose(close=False)
+
+os.register_at_fork(after_in_child=_reset_pool_after_fork)
+
+def init_db():
+    Base.metadata.create_all(bind=get_engine())
+    for name, engine in get_shard_map().engines.items():
+        with engine.begin() as conn:
+            for table_name in SHARDED_TABLES:
+                table = Base.metadata.tables[table_name]
+                if name != PRIMARY_SHARD:
+                    # Shards only hold tenant tables; their users/orgs live on primary, so no FKs
+                    conn.execute(CreateTable(table, include_foreign_key_constraints=[], if_not_exists=True))
+                # create_all skips tables that already exist, so indexes added later need this
+                for index in table.indexes:
+                    conn.execute(CreateIndex(index, if_not_exists=True))
+
+def warm_pool():
+    for engine in get_shard_map().engines.values():
+        # Check out a whole QueuePool at once so every slot holds an open connection;
+        # other pools (SingletonThreadPool, NullPool) just get a connectivity check
+        size = engine.pool.size() if isinstance(engine.pool, QueuePool) else 1
+        conns = [engine.connect() for _ in range(size)]
+        for conn in conns:
+            conn.close()
+
+def dispose_engines():
+    # Close pooled connections on shutdown; engines rebuild lazily if used again
+    global _engine, _shard_map
+    for engine in (_shard_map.engines.values() if _shard_map else [_engine]):
+        if engine is not None:
+            engine.dispose()
+    _engine, _shard_map = None, None
+
 def get_db():
+    get_engine()
     db = SessionLocal()
     try:
         yield db
@@ -1,14 +1,16 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from database import get_db
-import auth_utils, models
+from typing import Optional
+import auth_utils, cache, models, sharding
+import hashlib
 import os
 import uuid
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(request: Request, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -29,6 +31,15 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     user = db.query(models.User).filter(models.User.id == user_uuid).first()
     if user is None:
         raise credentials_exception
+    assignment = sharding.get_assignment(db, user.organization_id)
+    if assignment["moving"] and request.method != "GET":
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Organization is being moved, retry shortly",
+            headers={"Retry-After": "5"},
+        )
+    # Route this session's task queries to the tenant's shard
+    db.info["shard"] = assignment["shard"]
     return user
 
 def require_admin(current_user: models.User = Depends(get_current_user)):
@@ -38,3 +49,23 @@ def require_admin(current_user: models.User = Depends(get_current_user)):
             detail="Admin role required"
         )
     return current_user
+
+def conditional_etag(request: Request, token: str = Depends(oauth2_scheme)) -> Optional[str]:
+    """ETag for a tenant-scoped GET, answering If-None-Match with 304.
+
+    Derived from the token claims and the org generation counter only, so a
+    match returns before any DB or serialization work. Returns None (no ETag)
+    when the token is unusable or Redis is down; get_current_user handles auth.
+    """
+    payload = auth_utils.decode_token(token)
+    if not payload or not payload.get("org_id"):
+        return None
+    generation = cache.get_org_generation(payload["org_id"])
+    if generation is None:
+        return None
+    version = f"{request.url.path}?{request.url.query}:{payload.get('sub')}:{payload['org_id']}:{generation}"
+    etag = f'W/"{hashlib.sha1(version.encode()).hexdigest()}"'
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")]:
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return etag
@@ -1,17 +1,63 @@
-from fastapi import FastAPI, Depends, HTTPException, status, BackgroundTasks
+from fastapi import FastAPI, Depends, HTTPException, status, BackgroundTasks, Response
 from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Literal, Optional
 import models, schemas, services, auth_utils, dependencies, database, cache, background_tasks
-from database import engine, get_db
-from dependencies import get_current_user, require_admin
+from database import get_db
+from dependencies import get_current_user, require_admin, conditional_etag
+from contextlib import asynccontextmanager
+import asyncio
+from anyio import to_thread
+from config import get_settings
 import uuid
 
-# Initialize DB
-models.Base.metadata.create_all(bind=engine)
+WARM_UP_RETRY_SECONDS = 1
+WARM_UP_RETRY_MAX_SECONDS = 30
 
-app = FastAPI(title="Multi-Tenant Task API")
+def _warm_up():
+    database.init_db()
+    database.warm_pool()
+
+async def _retry_warm_up(app: FastAPI):
+    # Keep retrying with backoff so a DB that was briefly down at boot doesn't
+    # leave this worker out of rotation (/ready 503) for its whole life
+    delay = WARM_UP_RETRY_SECONDS
+    while not app.state.ready:
+        await asyncio.sleep(delay)
+        try:
+            await to_thread.run_sync(_warm_up)
+            app.state.ready = True
+        except Exception as e:
+            print(f"DB warm-up retry error: {e}")
+            delay = min(delay * 2, WARM_UP_RETRY_MAX_SECONDS)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # All startup I/O (settings, DDL, pool warm-up) happens here, never at import
+    app.state.ready = False
+    # Sync routes run in anyio's threadpool; this caps concurrent handlers per worker.
+    # It is deliberately larger than the DB pool: handlers beyond the pool wait for a
+    # connection instead of being queued behind the threadpool.
+    to_thread.current_default_thread_limiter().total_tokens = get_settings().threadpool_size
+    retry = None
+    try:
+        await to_thread.run_sync(_warm_up)
+        app.state.ready = True
+    except Exception as e:
+        print(f"DB warm-up error: {e}")
+        retry = asyncio.create_task(_retry_warm_up(app))
+    # Redis is optional (cache calls degrade gracefully), so it does not gate readiness
+    await to_thread.run_sync(cache.ping)
+    yield
+    app.state.ready = False
+    if retry:
+        retry.cancel()
+    await to_thread.run_sync(database.dispose_engines)
+    await to_thread.run_sync(cache.close_client)
+
+app = FastAPI(title="Multi-Tenant Task API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -19,8 +65,22 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
+# Brotli when brotli-asgi is installed (it falls back to gzip per client); gzip otherwise
+try:
+    from brotli_asgi import BrotliMiddleware
+    app.add_middleware(BrotliMiddleware, minimum_size=1000)
+except ImportError:
+    app.add_middleware(GZipMiddleware, minimum_size=1000)
+
+def set_etag(response: Response, etag: Optional[str]):
+    if etag:
+        response.headers["ETag"] = etag
+        # Let clients cache but revalidate every poll
+        response.headers["Cache-Control"] = "private, no-cache"
+
 # Auth Routes
 @app.post("/auth/register", response_model=schemas.User)
 def register(user: schemas.UserCreate, db: Session = Depends(get_db), bg_tasks: BackgroundTasks = BackgroundTasks()):
@@ -34,6 +94,7 @@ def register(user: schemas.UserCreate, db: Session = Depends(get_db), bg_tasks:
     # First user is admin
     user.role = "admin"
     new_user = services.create_user(db, user, org.id)
+    cache.invalidate_user_cache(str(org.id))
     
     bg_tasks.add_task(background_tasks.send_welcome_email, user.email)
     bg_tasks.add_task(background_tasks.log_audit_event, str(new_user.id), "register", "user")
@@ -61,26 +122,56 @@ def login(user_credentials: schemas.UserLogin, db: Session = Depends(get_db)):
 # Task Routes
 @app.get("/tasks", response_model=schemas.TaskPagination)
 def read_tasks(
+    response: Response,
+    etag: Optional[str] = Depends(conditional_etag),
     status: Optional[str] = None,
     priority: Optional[str] = None,
     page: int = 1,
     limit: int = 10,
+    count: Literal["exact", "estimate", "none"] = "exact",
+    archived: bool = False,
+    expand: Optional[Literal["assignee"]] = None,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    cache_key = f"tasks:{current_user.organization_id}:{current_user.id}:{status}:{priority}:{page}:{limit}"
+    set_etag(response, etag)
+    org_id = current_user.organization_id
+    # Keyed by generation like the ETag: a page built from pre-mutation rows lands under a stale key
+    generation = cache.get_org_generation(str(org_id))
+    cache_key = f"tasks:{org_id}:{generation}:{current_user.id}:{status}:{priority}:{page}:{limit}:{count}:{archived}:{expand}"
     cached_data = cache.get_cache(cache_key)
     if cached_data:
         return cached_data
 
     skip = (page - 1) * limit
-    tasks, total = services.get_tasks_with_count(db, current_user.organization_id, skip=skip, limit=limit, status=status, priority=priority)
+    tasks, has_more = services.get_tasks_page(db, org_id, skip=skip, limit=limit, status=status, priority=priority, archived=archived)
+
+    # Serialize from columns only; touching Task.assignee would lazy-load per row
+    tasks = [schemas.Task.model_validate(task).model_dump() for task in tasks]
+    if expand == "assignee":
+        assignee_ids = {task["assigned_to"] for task in tasks if task["assigned_to"]}
+        summaries = services.get_user_summaries(db, org_id, assignee_ids) if assignee_ids else {}
+        for task in tasks:
+            task["assignee"] = summaries.get(task["assigned_to"])
+
+    total = None
+    if count == "exact":
+        # Counts live outside the page cache, keyed by org generation, so flipping pages never recounts
+        count_key = f"count:{org_id}:{generation}:{status}:{priority}:{archived}"
+        total = cache.get_cache(count_key)
+        if total is None:
+            total = services.count_tasks(db, org_id, status=status, priority=priority, archived=archived)
+            cache.set_cache(count_key, total, ttl=300)
+    elif count == "estimate":
+        total = services.estimate_task_count(db, org_id, status=status, priority=priority, archived=archived)
     
     response_data = {
         "tasks": tasks,
         "total": total,
         "page": page,
-        "limit": limit
+        "limit": limit,
+        "has_more": has_more,
+        "count": count
     }
     
     # Store in cache
@@ -128,12 +219,19 @@ def delete_task(
 # Admin Routes
 @app.get("/admin/stats", response_model=schemas.OrgStats)
 def get_org_stats(
+    response: Response,
+    etag: Optional[str] = Depends(conditional_etag),
     db: Session = Depends(get_db), 
     admin_user: models.User = Depends(require_admin)
 ):
+    set_etag(response, etag)
     total = db.query(models.Task).filter(models.Task.organization_id == admin_user.organization_id).count()
     pending = db.query(models.Task).filter(models.Task.organization_id == admin_user.organization_id, models.Task.status == "pending").count()
     completed = db.query(models.Task).filter(models.Task.organization_id == admin_user.organization_id, models.Task.status == "completed").count()
+    # Archived tasks are all completed; count them so archival doesn't shrink the stats
+    archived = db.query(models.ArchivedTask).filter(models.ArchivedTask.organization_id == admin_user.organization_id).count()
+    total += archived
+    completed += archived
     
     return {
         "total_tasks": total,
@@ -145,6 +243,12 @@ def get_org_stats(
 def health_check():
     return {"status": "healthy"}
 
+@app.get("/ready")
+def readiness_check():
+    if not getattr(app.state, "ready", False):
+        raise HTTPException(status_code=503, detail="Not ready")
+    return {"status": "ready"}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, ForeignKey, DateTime, Enum, Text, Boolean
+from sqlalchemy import Column, String, Integer, ForeignKey, DateTime, Enum, Text, Boolean, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
@@ -41,6 +41,25 @@ class Task(Base):
     assignee = relationship("User", back_populates="assigned_tasks")
     organization = relationship("Organization", back_populates="tasks")
 
+    __table_args__ = (
+        Index("ix_tasks_org_status", "organization_id", "status"),
+        Index("ix_tasks_status_updated", "status", "updated_at"),  # archival scan
+    )
+
+class ArchivedTask(Base):
+    # Completed tasks moved out of the hot table by archive.py; read-only
+    __tablename__ = "archived_tasks"
+    id = Column(UUID(as_uuid=True), primary_key=True)
+    title = Column(String, nullable=False)
+    description = Column(Text)
+    status = Column(String)
+    priority = Column(String)
+    assigned_to = Column(UUID(as_uuid=True), ForeignKey("users.id"))
+    organization_id = Column(UUID(as_uuid=True), ForeignKey("organizations.id"), index=True)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    archived_at = Column(DateTime, default=datetime.datetime.utcnow)
+
 class AuditLog(Base):
     __tablename__ = "audit_logs"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -49,3 +68,10 @@ class AuditLog(Base):
     entity = Column(String, nullable=False)
     details = Column(Text)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+class ShardAssignment(Base):
+    __tablename__ = "shard_assignments"
+    organization_id = Column(UUID(as_uuid=True), ForeignKey("organizations.id"), primary_key=True)
+    shard = Column(String, nullable=False)
+    moving = Column(Boolean, default=False, nullable=False)  # writes blocked while move_org finishes
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
@@ -34,6 +34,12 @@ class User(UserBase):
     created_at: datetime
     model_config = ConfigDict(from_attributes=True)
 
+class UserSummary(BaseModel):
+    id: UUID
+    email: EmailStr
+    role: str
+    model_config = ConfigDict(from_attributes=True)
+
 # Token Schemas
 class Token(BaseModel):
     access_token: str
@@ -70,11 +76,16 @@ class Task(TaskBase):
     updated_at: datetime
     model_config = ConfigDict(from_attributes=True)
 
+class TaskWithAssignee(Task):
+    assignee: Optional[UserSummary] = None  # only populated with expand=assignee
+
 class TaskPagination(BaseModel):
-    tasks: List[Task]
-    total: int
+    tasks: List[TaskWithAssignee]
+    total: Optional[int] = None  # None when count=none
     page: int
     limit: int
+    has_more: bool = False
+    count: str = "exact"  # exact/estimate/none
 
 # Stats Schema
 class OrgStats(BaseModel):
@@ -0,0 +1,40 @@
+"""Production entry point: multi-worker uvicorn with graceful shutdown.
+
+Run with `python server.py`. Configure via environment variables:
+WEB_CONCURRENCY, HOST, PORT, GRACEFUL_TIMEOUT, THREADPOOL_SIZE, DB_POOL_SIZE.
+"""
+import importlib.util
+import os
+import uvicorn
+from config import get_settings
+
+def default_workers() -> int:
+    # Sync handlers block in the threadpool, so one worker per core keeps CPU busy
+    # without multiplying DB connections (workers * DB_POOL_SIZE) too far.
+    return max(os.cpu_count() or 1, 1)
+
+def _has(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+def main():
+    settings = get_settings()
+    workers = settings.web_concurrency or default_workers()
+    loop = "uvloop" if _has("uvloop") else "asyncio"
+    http = "httptools" if _has("httptools") else "h11"
+    print(f"Starting {workers} workers (loop={loop}, http={http})")
+    # Workers are separate processes that import main fresh, so each builds its own
+    # engine and Redis pool. On SIGTERM uvicorn stops accepting and drains in-flight
+    # requests for up to GRACEFUL_TIMEOUT seconds before exiting.
+    uvicorn.run(
+        "main:app",
+        host=settings.host,
+        port=settings.port,
+        workers=workers,
+        loop=loop,
+        http=http,
+        timeout_graceful_shutdown=settings.graceful_timeout,
+        proxy_headers=True,
+    )
+
+if __name__ == "__main__":
+    main()
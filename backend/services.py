@@ -1,5 +1,5 @@
 from sqlalchemy.orm import Session
-import models, schemas, auth_utils
+import models, schemas, auth_utils, cache, sharding
 from uuid import UUID
 from fastapi import HTTPException, status
 
@@ -7,6 +7,9 @@ from fastapi import HTTPException, status
 def create_organization(db: Session, org: schemas.OrganizationCreate):
     db_org = models.Organization(name=org.name)
     db.add(db_org)
+    db.flush()
+    # Pin placement now so later changes to the shard list never move this org
+    db.add(models.ShardAssignment(organization_id=db_org.id, shard=sharding.place_org(db_org.id)))
     db.commit()
     db.refresh(db_org)
     return db_org
@@ -31,6 +34,21 @@ def create_user(db: Session, user: schemas.UserCreate, org_id: UUID):
 def get_user_by_email(db: Session, email: str):
     return db.query(models.User).filter(models.User.email == email).first()
 
+def get_user_summaries(db: Session, org_id: UUID, user_ids):
+    """Resolve user ids to summaries with at most one IN query.
+
+    Summaries are cached per org; ids outside the org resolve to None.
+    """
+    key = cache.user_summary_key(str(org_id))
+    summaries = cache.get_cache(key) or {}
+    missing = {uid for uid in user_ids if str(uid) not in summaries}
+    if missing:
+        users = db.query(models.User).filter(models.User.organization_id == org_id, models.User.id.in_(missing)).all()
+        for user in users:
+            summaries[str(user.id)] = schemas.UserSummary.model_validate(user).model_dump(mode="json")
+        cache.set_cache(key, summaries, ttl=300)
+    return {uid: summaries.get(str(uid)) for uid in user_ids}
+
 # Task Services
 def create_task(db: Session, task: schemas.TaskCreate, org_id: UUID):
     db_task = models.Task(**task.model_dump(), organization_id=org_id)
@@ -39,25 +57,57 @@ def create_task(db: Session, task: schemas.TaskCreate, org_id: UUID):
     db.refresh(db_task)
     return db_task
 
-def get_tasks(db: Session, org_id: UUID, skip: int = 0, limit: int = 10, status: str = None, priority: str = None):
-    query = db.query(models.Task).filter(models.Task.organization_id == org_id)
+def _filtered_tasks_query(db: Session, org_id: UUID, status: str = None, priority: str = None, archived: bool = False):
+    model = models.ArchivedTask if archived else models.Task
+    query = db.query(model).filter(model.organization_id == org_id)
     if status:
-        query = query.filter(models.Task.status == status)
+        query = query.filter(model.status == status)
     if priority:
-        query = query.filter(models.Task.priority == priority)
+        query = query.filter(model.priority == priority)
+    return query
+
+def get_tasks(db: Session, org_id: UUID, skip: int = 0, limit: int = 10, status: str = None, priority: str = None):
+    query = _filtered_tasks_query(db, org_id, status, priority)
     return query.offset(skip).limit(limit).all()
 
 def get_tasks_with_count(db: Session, org_id: UUID, skip: int = 0, limit: int = 10, status: str = None, priority: str = None):
-    query = db.query(models.Task).filter(models.Task.organization_id == org_id)
-    if status:
-        query = query.filter(models.Task.status == status)
-    if priority:
-        query = query.filter(models.Task.priority == priority)
+    query = _filtered_tasks_query(db, org_id, status, priority)
     
     total = query.count()
     tasks = query.offset(skip).limit(limit).all()
     return tasks, total
 
+def get_tasks_page(db: Session, org_id: UUID, skip: int = 0, limit: int = 10, status: str = None, priority: str = None, archived: bool = False):
+    # Fetch one extra row so has_more is known without counting
+    query = _filtered_tasks_query(db, org_id, status, priority, archived)
+    rows = query.offset(skip).limit(limit + 1).all()
+    return rows[:limit], len(rows) > limit
+
+def count_tasks(db: Session, org_id: UUID, status: str = None, priority: str = None, archived: bool = False):
+    return _filtered_tasks_query(db, org_id, status, priority, archived).count()
+
+def _explain_statement(query, dialect):
+    # Compiled with real bind parameters: values never enter the SQL text, so
+    # quotes, ":name" and "%" in filters are safe. exec_driver_sql hands params
+    # straight to the DBAPI, so apply the types' bind processors ourselves.
+    compiled = query.statement.compile(dialect=dialect)
+    params = {}
+    for name, value in compiled.params.items():
+        process = compiled.binds[name].type.bind_processor(dialect)
+        params[name] = process(value) if process else value
+    return f"EXPLAIN (FORMAT JSON) {compiled}", params
+
+def estimate_task_count(db: Session, org_id: UUID, status: str = None, priority: str = None, archived: bool = False):
+    # Planner row estimate is Postgres-only; other backends get the exact count
+    model = models.ArchivedTask if archived else models.Task
+    dialect = db.get_bind(model).dialect
+    if dialect.name != "postgresql":
+        return count_tasks(db, org_id, status, priority, archived)
+    query = _filtered_tasks_query(db, org_id, status, priority, archived).with_entities(model.id)
+    sql, params = _explain_statement(query, dialect)
+    plan = db.connection(bind_arguments={"mapper": model}).exec_driver_sql(sql, params).scalar()
+    return int(plan[0]["Plan"]["Plan Rows"])
+
 def update_task(db: Session, task_id: UUID, task_update: schemas.TaskUpdate, org_id: UUID):
     db_task = db.query(models.Task).filter(models.Task.id == task_id, models.Task.organization_id == org_id).first()
     if not db_task:
@@ -0,0 +1,174 @@
+"""Tenant shard placement, resolution and the online org-move tool.
+
+Every org is pinned to a shard in shard_assignments when it is created, so
+changing DATABASE_SHARDS never relocates existing tenants. Before enabling
+shards on an existing deployment, pin the current orgs to primary:
+
+    python sharding.py backfill
+
+Moving an org, including pinning a big tenant to its own shard:
+
+    python sharding.py move <organization_id> <shard>
+"""
+import argparse
+import time
+from uuid import UUID
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from config import get_settings
+from database import PRIMARY_SHARD, SessionLocal, get_engine, get_shard_map
+import cache, models
+
+# Moved together; archived tasks live on the same shard as the active ones
+SHARDED_MODELS = [models.Task, models.ArchivedTask]
+
+def place_org(org_id: UUID) -> str:
+    # Unsharded deployments need no engines to place an org
+    if not get_settings().database_shards:
+        return PRIMARY_SHARD
+    return get_shard_map().shard_for(org_id)
+
+def get_assignment(db: Session, org_id: UUID) -> dict:
+    """The org's pinned shard and whether it is mid-move.
+
+    Cached in Redis under the org generation, which assign_shard bumps after
+    committing, so a reader racing a move can only refill a key nobody reads.
+    Orgs that predate assignments (not yet backfilled) stay on primary, where
+    their data already is.
+    """
+    if not get_settings().database_shards:
+        return {"shard": PRIMARY_SHARD, "moving": False}
+    generation = cache.get_org_generation(str(org_id))
+    key = f"shard:{org_id}:{generation}"
+    assignment = cache.get_cache(key) if generation is not None else None
+    if assignment:
+        return assignment
+    row = db.get(models.ShardAssignment, org_id)
+    assignment = {"shard": row.shard, "moving": row.moving} if row else {"shard": PRIMARY_SHARD, "moving": False}
+    if generation is not None:
+        cache.set_cache(key, assignment, ttl=3600)
+    return assignment
+
+def resolve_shard(db: Session, org_id: UUID) -> str:
+    return get_assignment(db, org_id)["shard"]
+
+def assign_shard(db: Session, org_id: UUID, shard: str, moving: bool = False):
+    db.merge(models.ShardAssignment(organization_id=org_id, shard=shard, moving=moving))
+    db.commit()
+    cache.bump_org_generation(str(org_id))
+
+def backfill_assignments(db: Session) -> int:
+    """Pin every org without an assignment to primary, where its data lives."""
+    assigned = select(models.ShardAssignment.organization_id)
+    orgs = db.query(models.Organization.id).filter(models.Organization.id.not_in(assigned)).all()
+    for (org_id,) in orgs:
+        db.add(models.ShardAssignment(organization_id=org_id, shard=PRIMARY_SHARD))
+    db.commit()
+    for (org_id,) in orgs:
+        cache.bump_org_generation(str(org_id))
+    return len(orgs)
+
+def _copy_rows(table, src, dst, org_id: UUID, batch_size: int, ids: list = None):
+    query = select(table).where(table.c.organization_id == org_id).order_by(table.c.id).limit(batch_size)
+    if ids is not None:
+        query = query.where(table.c.id.in_(ids))
+    copied, last_id = 0, None
+    while True:
+        stmt = query if last_id is None else query.where(table.c.id > last_id)
+        with src.connect() as conn:
+            rows = [dict(row._mapping) for row in conn.execute(stmt)]
+        if not rows:
+            return copied
+        batch_ids = [row["id"] for row in rows]
+        with dst.begin() as conn:
+            conn.execute(table.delete().where(table.c.id.in_(batch_ids)))
+            conn.execute(table.insert(), rows)
+        copied += len(rows)
+        last_id = batch_ids[-1]
+
+def _reconcile_rows(table, src, dst, org_id: UUID, batch_size: int):
+    """Make the target match the source by comparing (id, updated_at) pairs.
+
+    No wall-clock cutoff is involved, so clock skew between the app hosts and
+    the host running the move cannot hide a write. Rows that are missing or
+    differ on the target are re-copied; rows gone from the source are deleted.
+    """
+    versions = select(table.c.id, table.c.updated_at).where(table.c.organization_id == org_id)
+    with src.connect() as conn:
+        source = dict(conn.execute(versions).all())
+    with dst.connect() as conn:
+        target = dict(conn.execute(versions).all())
+    stale = list(target.keys() - source.keys())
+    changed = [row_id for row_id, updated_at in source.items() if row_id not in target or target[row_id] != updated_at]
+    for start in range(0, len(stale), batch_size):
+        with dst.begin() as conn:
+            conn.execute(table.delete().where(table.c.id.in_(stale[start:start + batch_size])))
+    for start in range(0, len(changed), batch_size):
+        _copy_rows(table, src, dst, org_id, batch_size, ids=changed[start:start + batch_size])
+
+def move_org(org_id: UUID, target: str, batch_size: int = 500, drain_seconds: float = 5) -> int:
+    """Move one org's tasks to ``target`` while it keeps serving reads.
+
+    Rows are bulk-copied while the org stays writable. The org is then marked
+    moving, which makes get_current_user reject its writes with 503, and we
+    wait ``drain_seconds`` for writes already in flight to finish. The target is
+    then reconciled against the frozen source (changed, new and deleted rows
+    in both tables), and the org is flipped to the target before the source rows are deleted. No write
+    is lost; the org is read-only for the drain and catch-up only.
+    ``drain_seconds`` should exceed the longest request time.
+    """
+    shard_map = get_shard_map()
+    if target not in shard_map.engines:
+        raise ValueError(f"Unknown shard: {target}")
+
+    get_engine()
+    db = SessionLocal()
+    try:
+        source = resolve_shard(db, org_id)
+        if source == target:
+            return 0
+        src, dst = shard_map.engines[source], shard_map.engines[target]
+        tables = [model.__table__ for model in SHARDED_MODELS]
+        moved = _copy_rows(tables[0], src, dst, org_id, batch_size)
+        for table in tables[1:]:
+            _copy_rows(table, src, dst, org_id, batch_size)
+
+        assign_shard(db, org_id, source, moving=True)
+        try:
+            time.sleep(drain_seconds)
+            for table in tables:
+                _reconcile_rows(table, src, dst, org_id, batch_size)
+            assign_shard(db, org_id, target)
+        except Exception:
+            # Leave the org on the untouched source and writable again
+            assign_shard(db, org_id, source)
+            raise
+
+        with src.begin() as conn:
+            for table in tables:
+                conn.execute(table.delete().where(table.c.organization_id == org_id))
+        return moved
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tenant shard tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("backfill", help="Pin every unassigned organization to primary")
+    move = sub.add_parser("move", help="Move an organization's tasks to another shard")
+    move.add_argument("organization_id", type=UUID)
+    move.add_argument("shard")
+    move.add_argument("--batch-size", type=int, default=500)
+    move.add_argument("--drain-seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    if args.command == "backfill":
+        get_engine()
+        db = SessionLocal()
+        try:
+            print(f"Pinned {backfill_assignments(db)} organizations to {PRIMARY_SHARD}")
+        finally:
+            db.close()
+    else:
+        moved = move_org(args.organization_id, args.shard, args.batch_size, args.drain_seconds)
+        print(f"Moved {moved} tasks for {args.organization_id} to {args.shard}")
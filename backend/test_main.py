@@ -54,4 +54,42 @@ def test_create_task():
     # List Tasks
     list_response = client.get("/tasks", headers=headers)
     assert list_response.status_code == 200
-    assert len(list_response.json()) == 1
+    assert len(list_response.json()["tasks"]) == 1
+
+def test_ready_recovers_after_failed_warm_up(monkeypatch):
+    import threading, time
+    import database, main
+
+    attempts = []
+    db_back = threading.Event()
+    def flaky_init_db():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("database unreachable")
+        db_back.wait(5)
+    monkeypatch.setattr(database, "init_db", flaky_init_db)
+    monkeypatch.setattr(database, "warm_pool", lambda: None)
+    monkeypatch.setattr(main, "WARM_UP_RETRY_SECONDS", 0.01)
+
+    with TestClient(app) as lifespan_client:
+        assert lifespan_client.get("/ready").status_code == 503
+        db_back.set()
+        deadline = time.time() + 5
+        while lifespan_client.get("/ready").status_code != 200 and time.time() < deadline:
+            time.sleep(0.01)
+        assert lifespan_client.get("/ready").status_code == 200
+    assert len(attempts) == 2
+
+def test_lifespan_releases_clients_on_shutdown(monkeypatch):
+    import cache, database
+
+    closed = []
+    monkeypatch.setattr(database, "init_db", lambda: None)
+    monkeypatch.setattr(database, "warm_pool", lambda: None)
+    monkeypatch.setattr(database, "dispose_engines", lambda: closed.append("db"))
+    monkeypatch.setattr(cache, "close_client", lambda: closed.append("redis"))
+
+    with TestClient(app) as lifespan_client:
+        assert lifespan_client.get("/ready").status_code == 200
+        assert closed == []
+    assert closed == ["db", "redis"]
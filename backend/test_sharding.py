@@ -0,0 +1,217 @@
+import json
+import uuid
+import pytest
+from sqlalchemy import func, select
+import database, models, schemas, services, sharding
+from config import get_settings
+from database import ShardMap
+
+def _configure(monkeypatch, tmp_path, shard_names):
+    for engine in (database._shard_map.engines.values() if database._shard_map else []):
+        engine.dispose()
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path}/primary.db")
+    monkeypatch.setenv("DATABASE_SHARDS", json.dumps({name: f"sqlite:///{tmp_path}/{name}.db" for name in shard_names}))
+    get_settings.cache_clear()
+    monkeypatch.setattr(database, "_engine", None)
+    monkeypatch.setattr(database, "_shard_map", None)
+    database.init_db()
+    return database.get_shard_map()
+
+@pytest.fixture
+def shards(tmp_path, monkeypatch):
+    # Three local SQLite files: primary (orgs/users + its own tasks) and two task shards
+    shard_map = _configure(monkeypatch, tmp_path, ["shard1", "shard2"])
+    yield shard_map
+    for engine in database.get_shard_map().engines.values():
+        engine.dispose()
+    get_settings.cache_clear()
+
+def _task_count(engine, org_id):
+    with engine.connect() as conn:
+        table = models.Task.__table__
+        return conn.execute(select(func.count()).select_from(table).where(table.c.organization_id == org_id)).scalar()
+
+def _tenant_session(org_id):
+    db = database.SessionLocal()
+    db.info["shard"] = sharding.resolve_shard(db, org_id)
+    return db
+
+def test_consistent_hash_is_stable():
+    orgs = [uuid.uuid4() for _ in range(500)]
+    two = ShardMap({"a": None, "b": None})
+    three = ShardMap({"a": None, "b": None, "c": None})
+    assert [two.shard_for(o) for o in orgs] == [ShardMap({"a": None, "b": None}).shard_for(o) for o in orgs]
+    # Adding a shard relocates only the orgs that land on it
+    moved = sum(two.shard_for(o) != three.shard_for(o) for o in orgs)
+    assert moved < len(orgs) / 2
+    assert all(three.shard_for(o) == "c" for o in orgs if two.shard_for(o) != three.shard_for(o))
+
+def test_tasks_are_stored_on_the_org_shard(shards):
+    db = database.SessionLocal()
+    org = services.create_organization(db, schemas.OrganizationCreate(name="Sharded Org"))
+    db.close()
+
+    db = _tenant_session(org.id)
+    shard = db.info["shard"]
+    services.create_task(db, schemas.TaskCreate(title="On shard"), org.id)
+    tasks, total = services.get_tasks_with_count(db, org.id)
+    db.close()
+
+    assert total == 1 and tasks[0].title == "On shard"
+    assert _task_count(shards.engines[shard], org.id) == 1
+    for name, engine in shards.engines.items():
+        if name != shard:
+            assert _task_count(engine, org.id) == 0
+
+def test_move_org_between_shards(shards):
+    db = database.SessionLocal()
+    org = services.create_organization(db, schemas.OrganizationCreate(name="Moving Org"))
+    db.close()
+
+    db = _tenant_session(org.id)
+    source = db.info["shard"]
+    for i in range(7):
+        services.create_task(db, schemas.TaskCreate(title=f"Task {i}"), org.id)
+    db.close()
+
+    target = next(name for name in shards.engines if name != source)
+    assert sharding.move_org(org.id, target, batch_size=3, drain_seconds=0) == 7
+
+    assert _task_count(shards.engines[source], org.id) == 0
+    assert _task_count(shards.engines[target], org.id) == 7
+    db = _tenant_session(org.id)
+    assert db.info["shard"] == target
+    assert services.get_tasks_with_count(db, org.id)[1] == 7
+    db.close()
+
+def _create_org_with_tasks(name, count):
+    db = database.SessionLocal()
+    org = services.create_organization(db, schemas.OrganizationCreate(name=name))
+    db.close()
+    db = _tenant_session(org.id)
+    for i in range(count):
+        services.create_task(db, schemas.TaskCreate(title=f"{name} {i}"), org.id)
+    db.close()
+    return org
+
+def test_changing_shard_list_never_relocates_existing_orgs(tmp_path, monkeypatch):
+    _configure(monkeypatch, tmp_path, [])
+    orgs = [_create_org_with_tasks(f"Org {i}", 2) for i in range(6)]
+    # An org from before shard assignments existed; backfill pins it to primary
+    db = database.SessionLocal()
+    db.query(models.ShardAssignment).filter(models.ShardAssignment.organization_id == orgs[0].id).delete()
+    db.commit()
+    assert sharding.backfill_assignments(db) == 1
+    db.close()
+
+    for shard_names in (["shard1", "shard2"], ["shard1", "shard2", "shard3"]):
+        _configure(monkeypatch, tmp_path, shard_names)
+        for org in orgs:
+            db = _tenant_session(org.id)
+            assert db.info["shard"] == database.PRIMARY_SHARD
+            assert services.count_tasks(db, org.id) == 2
+            db.close()
+    for engine in database.get_shard_map().engines.values():
+        engine.dispose()
+    get_settings.cache_clear()
+
+def test_move_org_does_not_resurrect_rows_deleted_during_copy(shards, monkeypatch):
+    org = _create_org_with_tasks("Deleting Org", 4)
+    db = _tenant_session(org.id)
+    source = db.info["shard"]
+    doomed = services.get_tasks(db, org.id, limit=1)[0].id
+    db.close()
+    target = next(name for name in shards.engines if name != source)
+
+    def delete_after_copy(seconds):
+        # Runs after the bulk copy, standing in for a delete that raced it
+        db = database.SessionLocal()
+        assert sharding.get_assignment(db, org.id)["moving"] is True
+        db.close()
+        table = models.Task.__table__
+        with shards.engines[source].begin() as conn:
+            conn.execute(table.delete().where(table.c.id == doomed))
+    monkeypatch.setattr(sharding.time, "sleep", delete_after_copy)
+
+    sharding.move_org(org.id, target, drain_seconds=0)
+
+    assert _task_count(shards.engines[target], org.id) == 3
+    db = _tenant_session(org.id)
+    assert sharding.get_assignment(db, org.id) == {"shard": target, "moving": False}
+    assert doomed not in [t.id for t in services.get_tasks(db, org.id)]
+    db.close()
+
+def test_move_org_catches_up_writes_from_skewed_clocks(shards, monkeypatch):
+    from datetime import datetime, timedelta
+
+    org = _create_org_with_tasks("Skewed Org", 3)
+    db = _tenant_session(org.id)
+    source = db.info["shard"]
+    edited = services.get_tasks(db, org.id, limit=1)[0].id
+    db.close()
+    target = next(name for name in shards.engines if name != source)
+
+    def write_during_copy(seconds):
+        # An app host with a slow clock edits one row and creates another after the bulk copy
+        table = models.Task.__table__
+        past = datetime.utcnow() - timedelta(hours=1)
+        with shards.engines[source].begin() as conn:
+            conn.execute(table.update().where(table.c.id == edited).values(title="Edited", updated_at=past))
+            conn.execute(table.insert().values(id=uuid.uuid4(), title="Late", organization_id=org.id, created_at=past, updated_at=past))
+    monkeypatch.setattr(sharding.time, "sleep", write_during_copy)
+
+    sharding.move_org(org.id, target, drain_seconds=0)
+
+    db = _tenant_session(org.id)
+    titles = {t.id: t.title for t in services.get_tasks(db, org.id, limit=10)}
+    db.close()
+    assert len(titles) == 4
+    assert titles[edited] == "Edited"
+    assert "Late" in titles.values()
+
+@pytest.mark.parametrize("honour_moving_flag", [True, False])
+def test_archive_during_move_keeps_rows(shards, monkeypatch, honour_moving_flag):
+    import archive
+    from datetime import datetime, timedelta
+
+    org = _create_org_with_tasks("Archiving Org", 0)
+    db = _tenant_session(org.id)
+    source = db.info["shard"]
+    task = services.create_task(db, schemas.TaskCreate(title="Old", status="completed"), org.id)
+    db.query(models.Task).filter(models.Task.id == task.id).update(
+        {"updated_at": datetime.utcnow() - timedelta(days=90)}, synchronize_session=False
+    )
+    db.commit()
+    db.close()
+    target = next(name for name in shards.engines if name != source)
+
+    if not honour_moving_flag:
+        # Stands in for an archive batch that read the moving list just before the flag was set
+        monkeypatch.setattr(archive, "_moving_orgs", lambda: [])
+    monkeypatch.setattr(sharding.time, "sleep", lambda seconds: archive.archive_completed_tasks(shards.engines[source], older_than_days=30))
+
+    sharding.move_org(org.id, target, drain_seconds=0)
+
+    archived_table = models.ArchivedTask.__table__
+    with shards.engines[target].connect() as conn:
+        archived = conn.execute(select(func.count()).select_from(archived_table).where(archived_table.c.organization_id == org.id)).scalar()
+    active = _task_count(shards.engines[target], org.id)
+    assert (active, archived) == ((1, 0) if honour_moving_flag else (0, 1))
+    assert _task_count(shards.engines[source], org.id) == 0
+
+def test_init_db_adds_missing_indexes_to_existing_tables(tmp_path, monkeypatch):
+    from sqlalchemy import inspect as sa_inspect
+
+    shard_map = _configure(monkeypatch, tmp_path, ["shard1"])
+    for engine in shard_map.engines.values():
+        with engine.begin() as conn:
+            conn.exec_driver_sql("DROP INDEX ix_tasks_org_status")
+            conn.exec_driver_sql("DROP INDEX ix_tasks_status_updated")
+
+    database.init_db()
+
+    for engine in shard_map.engines.values():
+        names = {index["name"] for index in sa_inspect(engine).get_indexes("tasks")}
+        assert {"ix_tasks_org_status", "ix_tasks_status_updated"} <= names
+        engine.dispose()
+    get_settings.cache_clear()